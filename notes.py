@@ -17,7 +17,7 @@ Author: Matthew Denton
 
 #################################################################
 """
-import os, json
+import os, json, uuid, atexit, getpass, hashlib
 from os.path import join, dirname
 
 # Load the current package data.
@@ -31,21 +31,49 @@ if package_json:
 
 from dataclasses import dataclass
 from PySide2 import QtCore, QtGui
-from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QDialog, QCheckBox, QLineEdit, QLabel, QPlainTextEdit, QSpacerItem, QSizePolicy, QToolButton, QScrollArea
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QDialog, QCheckBox, QLineEdit, QLabel, QPlainTextEdit, QSpacerItem, QSizePolicy, QToolButton, QScrollArea, QComboBox
 from shiboken2 import wrapInstance
 from maya.app.general.mayaMixin import MayaQWidgetDockableMixin
 from maya import cmds, OpenMayaUI
-from maya.OpenMaya import MSceneMessage
+from maya.OpenMaya import MSceneMessage, MFileIO
 from datetime import datetime, timedelta
 from math import floor
+from itertools import chain
+from bisect import bisect_left
 
 
 WTITLE = 'Notes'
 WOBJ = 'notes'
 META_NODE = 'notesCache'
 META_TAG = 'notes-meta'
+CHECKLIST_PAGE_SIZE = 50        # Checklist rows shown at a time.
+CHECKLIST_COLLAPSE_SIZE = 100   # Checklists longer than this start collapsed.
+JOURNAL_DIR = 'journal'
+PREVIEW_DIR = 'previews'
+PREVIEW_MAX_DAYS = 30   # Age of an unused preview before it's deleted.
+JOURNAL_FLUSH_MS = 2000                 # How long edits are batched before being written.
+EVENTS_FLUSH_MS = 1000  # How long saves are batched before subscribers are told.
+JOURNAL_COMPACT_SIZE = 4 * 1024 * 1024  # Journal size in bytes before it's compacted.
+JOURNAL_MAX_DAYS = 14                   # Age of an untouched journal before it's deleted.
+VIEW_OPTION = 'notesView'       # optionVars remembering the chosen view and filter.
+FILTER_OPTION = 'notesFilter'
+
+# Kinds of NoteEvent sent to subscribers.
+NOTE_ADDED = 'added'
+NOTE_REMOVED = 'removed'
+NOTE_EDITED = 'edited'
+CHECK_TOGGLED = 'check-toggled'
+NOTES_RELOADED = 'reloaded'
+NOTES_IMPORTED = 'imported'
 
 notes = []  # Stores all notes currently loaded.
+_reference_cache = {}  # Referenced file path -> (hash of its cache data, notes)
+_subscribers = []  # Callbacks given lists of NoteEvents when notes are saved.
+_snapshot = {}  # Note id -> serialized note when subscribers were last notified.
+_events_pending = False  # If notes were saved since subscribers were last notified.
+
+# Namespace used to derive stable ids for notes saved before ids existed.
+LEGACY_ID_NAMESPACE = uuid.UUID('6c1f3a52-0d4e-4a8e-9a59-2f0b7c9e5d11')
 
 
 def save_notes():
@@ -65,38 +93,428 @@ def save_notes():
 
     cmds.setAttr(f'{META_NODE}.data', json.dumps(notes_array), type='string')
 
+    # Keep a copy of the edits outside the scene in case maya crashes.
+    journal.sync(_scene_path(), notes)
+
+    if _subscribers:
+        _schedule_events()
+
 
-def load_notes():
+def load_notes(recover: bool = True, preview=None) -> bool:
     '''
-    Loads notes for the currently open scene.
+    Loads notes for the currently open scene. If recover is true and the journal
+    has edits for this scene that never got saved, the user is asked if they
+    should be restored.
+
+    If a NotesPreview shown while the scene was opening is given and the scene
+    still holds the same data, its notes are reused instead of decoding them
+    again. Returns True if the preview notes were reused unchanged.
     '''
+    # Send the changes of the scene being left before comparing to a new one.
+    _flush_events()
     notes.clear()
-    if not cmds.objExists(META_NODE):
-        return # Don't even bother
+    reused = False
+    if cmds.objExists(META_NODE):
+        try:
+            # try and load the data from the cahce node.
+            data = cmds.getAttr(f'{META_NODE}.data')
+            if preview is not None and preview.data == data:
+                for note in preview.notes:
+                    note.source = None
+                    notes.append(note)
+                reused = True
+            else:
+                _decode_notes(data)
+        except Exception:
+            pass
+
+    scene = _scene_path()
+    journal.reset(scene, notes)
+    if _subscribers:
+        _take_snapshot()
+        _notify([NoteEvent(NOTES_RELOADED)])
+    recovered = recover and _recover_notes(scene)
+    return reused and not recovered
+
+
+def subscribe(callback):
+    '''
+    Registers a callback to be told about changes to the notes. Saves are batched
+    and the callback is called with a list of the NoteEvents since it was last
+    called, at most once every EVENTS_FLUSH_MS, so there's no need to poll and
+    decode the cache node. Loading a scene sends a single NOTES_RELOADED event.
+    '''
+    if not _subscribers:
+        _take_snapshot()
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    '''Stops a callback from being told about changes to the notes.'''
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
 
+def _take_snapshot():
+    # Remember the notes as they are so the next save can be compared to them.
+    _snapshot.clear()
+    for note in notes:
+        _snapshot[note.id] = note.serialize()
+
+
+def _schedule_events():
+    # Sends the events of every save in the next EVENTS_FLUSH_MS together.
+    # Without a Qt application, as in batch mode, they are sent right away.
+    global _events_pending
+    if QtCore.QCoreApplication.instance() is None:
+        _events_pending = True
+        _flush_events()
+    elif not _events_pending:
+        _events_pending = True
+        QtCore.QTimer.singleShot(EVENTS_FLUSH_MS, _flush_events)
+
+
+def _flush_events():
+    # Compares the notes to the snapshot and sends what changed.
+    global _events_pending
+    if not _events_pending:
+        return
+    _events_pending = False
+    if _subscribers:
+        _notify(_note_events({note.id: note.serialize() for note in notes}))
+
+
+def _notify(events: list):
+    if not events:
+        return
+    for callback in list(_subscribers):
+        try:
+            callback(events)
+        except Exception as e:
+            print(f'Notes subscriber {callback} failed: {e}')
+
+
+def _note_events(serialized: dict) -> list:
+    '''
+    Compares the serialized notes to the last snapshot and returns the NoteEvents
+    for what changed. The snapshot is then updated.
+    '''
+    events = []
+    for note_id, data in serialized.items():
+        previous = _snapshot.get(note_id)
+        if previous is None:
+            events.append(NoteEvent(NOTE_ADDED, note_id))
+        elif previous != data:
+            events.extend(_note_changes(note_id, json.loads(previous), json.loads(data)))
+
+    for note_id in _snapshot.keys() - serialized.keys():
+        events.append(NoteEvent(NOTE_REMOVED, note_id))
+
+    _snapshot.clear()
+    _snapshot.update(serialized)
+    return events
+
+
+def _note_changes(note_id: str, old: dict, new: dict) -> list:
+    # Returns the events for the differences between two versions of a note.
+    fields = [key for key in new
+              if key not in ('modified_date', 'checklist') and old.get(key) != new[key]]
+    events = []
+
+    old_checks = {}
+    for checkJson in old['checklist']:
+        check = json.loads(checkJson)
+        old_checks[check.get('id')] = check
+
+    checklist_changed = len(old['checklist']) != len(new['checklist'])
+    for checkJson in new['checklist']:
+        check = json.loads(checkJson)
+        before = old_checks.get(check.get('id'))
+        if before is None or before['text'] != check['text']:
+            checklist_changed = True
+        elif before['checked'] != check['checked']:
+            events.append(NoteEvent(CHECK_TOGGLED, note_id,
+                                    check_id=check.get('id'), checked=check['checked']))
+
+    if checklist_changed:
+        fields.append('checklist')
+    if fields:
+        events.insert(0, NoteEvent(NOTE_EDITED, note_id, fields=tuple(fields)))
+    return events
+
+
+def save_preview(scene: str = None, data: str = None):
+    '''
+    Writes the notes of a scene file to the local preview cache so they can be
+    shown next time before the scene has finished opening. The preview is only
+    used while the modification time of the file is the same, so data must be
+    what the file holds. It defaults to the cache node, which is only the same
+    as the file right after the scene was saved.
+    '''
+    scene = scene or _scene_path()
+    if data is None and cmds.objExists(META_NODE):
+        data = cmds.getAttr(f'{META_NODE}.data')
+    if not scene or data is None:
+        return
     try:
-        # try and load the data from the cahce node.
-        data = json.loads(cmds.getAttr(f'{META_NODE}.data'))
-
-        # Create a new Note pbject for every cached note.
-        for noteData in data:
-            noteMeta = json.loads(noteData)
-
-            checklist = []
-            for checkJson in noteMeta['checklist']:
-                check = json.loads(checkJson)
-                checklist.append(NoteCheck(check['text'], check['checked']))
-
-            Note(
-                title=noteMeta['title'],
-                text=noteMeta['text'],
-                created_date=datetime.strptime(noteMeta['created_date'], '%Y-%m-%d %H:%M:%S.%f'), # 2022-01-20 23:00:00.00
-                author=noteMeta['author'],
-                pinned=noteMeta['pinned'],
-                checklist=checklist
-            )
-    except Exception:
-        pass
+        with open(_preview_path(scene), 'w', encoding='utf-8') as file:
+            json.dump({
+                'scene': scene,
+                'mtime': os.path.getmtime(scene),
+                'data': data
+            }, file)
+    except OSError:
+        print(f'Failed to write notes preview for {scene}')
+    _prune_previews()
+
+
+def _prune_previews():
+    # Deletes previews that have not been written in PREVIEW_MAX_DAYS, the
+    # scenes they are for have most likely not been opened since.
+    folder = dirname(_local_path(join(PREVIEW_DIR, '')))
+    oldest = datetime.now() - timedelta(days=PREVIEW_MAX_DAYS)
+    for fileName in os.listdir(folder):
+        path = join(folder, fileName)
+        try:
+            if datetime.fromtimestamp(os.path.getmtime(path)) < oldest:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def load_preview(scene: str):
+    '''
+    Returns a NotesPreview of a scene from the local preview cache, or None if
+    there isn't one or the scene file was changed after it was written.
+    '''
+    if not scene:
+        return None
+    try:
+        with open(_preview_path(scene), 'r', encoding='utf-8') as file:
+            preview = json.load(file)
+        if preview['scene'] != scene or preview['mtime'] != os.path.getmtime(scene):
+            return None
+        return NotesPreview(scene, preview['data'], _decode_notes(preview['data'], source=scene))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _preview_path(scene: str) -> str:
+    # Previews are named by a hash of the scene path.
+    name = hashlib.sha1(os.path.normcase(scene).encode('utf-8')).hexdigest()
+    return _local_path(join(PREVIEW_DIR, f'{name}.json'))
+
+
+def load_referenced_notes() -> dict:
+    '''
+    Returns the read-only notes of every referenced file that has its own cache
+    node, keyed by the path of the file. Decoded notes are kept per file path and
+    a hash of the nodes data, so unchanged references are not decoded again and
+    the same list of notes is returned for them.
+    '''
+    referenced = {}
+    for node in cmds.ls(META_NODE, recursive=True) or []:
+        if not cmds.referenceQuery(node, isNodeReferenced=True):
+            continue
+        path = cmds.referenceQuery(node, filename=True, withoutCopyNumber=True)
+        data = cmds.getAttr(f'{node}.data') or ''
+        digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+        cached = _reference_cache.get(path)
+        if cached is None or cached[0] != digest:
+            try:
+                cached = (digest, _decode_notes(data, source=path))
+            except Exception:
+                cached = (digest, [])
+            _reference_cache[path] = cached
+        referenced[path] = cached[1]
+
+    # Forget files that are no longer referenced.
+    for path in _reference_cache.keys() - referenced.keys():
+        del _reference_cache[path]
+    return referenced
+
+
+def _decode_notes(data: str, source: str = None) -> list:
+    '''
+    Creates a Note for every note in the data of a cache node. If source is given
+    the notes are read-only notes from that file.
+    '''
+    decoded = []
+    for noteData in json.loads(data):
+        decoded.append(Note(source=source, **_note_kwargs(json.loads(noteData))))
+    return decoded
+
+
+def _recover_notes(scene: str) -> bool:
+    '''
+    Offers to replay any journaled edits that are newer than the loaded notes.
+    Returns True if any were replayed.
+    '''
+    if cmds.about(batch=True):
+        return False
+    entries = journal.pending(scene, notes)
+    if not entries:
+        return False
+
+    answer = cmds.confirmDialog(
+        title=WTITLE,
+        message=f'Found {len(entries)} note edits for this scene that were never '
+                'saved, maya may have closed unexpectedly.\nDo you want to recover them?',
+        button=['Recover', 'Discard'],
+        defaultButton='Recover',
+        cancelButton='Discard',
+        dismissString='Discard'
+    )
+    if answer != 'Recover':
+        journal.discard(entries)
+        return False
+
+    index = {note.id: note for note in notes}
+    for entry in entries:
+        if entry['note'] is None:
+            notes.remove(index.pop(entry['id']))
+        else:
+            _merge_note(index, _note_kwargs(json.loads(entry['note'])))
+    save_notes()
+    return True
+
+
+def export_notes(path: str, source: list = None, append: bool = False) -> int:
+    '''
+    Streams notes out to a JSON Lines file, writing one serialized note per line.
+    Pass append=True to collect the notes of several scenes into the same file.
+    Returns the number of notes written.
+    '''
+    count = 0
+    with open(path, 'a' if append else 'w', encoding='utf-8') as file:
+        for note in notes if source is None else source:
+            file.write(note.serialize())
+            file.write('\n')
+            count += 1
+    return count
+
+
+def import_notes(path: str, save: bool = True) -> tuple:
+    '''
+    Streams notes in from a JSON Lines file, merging them into the loaded notes
+    by their id. When a note already exists the copy modified last wins, so
+    importing the same file twice will not duplicate anything.
+    Returns a tuple of how many notes were (added, updated).
+
+    Updated notes are given new checks, so once anything was merged subscribers
+    get a NOTES_IMPORTED event straight away. An open notes panel rebuilds its
+    widgets from it, edits made to the old checks would otherwise be lost.
+    '''
+    index = {note.id: note for note in notes}
+    added = updated = 0
+
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            merged = _merge_note(index, _note_kwargs(json.loads(line)))
+            if merged == 'added':
+                added += 1
+            elif merged == 'updated':
+                updated += 1
+
+    if added or updated:
+        if save:
+            save_notes()
+        _flush_events()
+        _notify([NoteEvent(NOTES_IMPORTED)])
+    return added, updated
+
+
+def _merge_note(index: dict, kwargs: dict) -> str:
+    '''
+    Merges a note into the loaded notes, where index maps the loaded notes by id.
+    An existing note is only overwritten if the merged one was modified later.
+    Returns 'added', 'updated' or None if the note was older and ignored.
+    '''
+    existing = index.get(kwargs['id'])
+    if existing is None:
+        note = Note(**kwargs)
+        index[note.id] = note
+        return 'added'
+    if kwargs['modified_date'] > existing.modified_date:
+        for key, value in kwargs.items():
+            setattr(existing, key, value)
+        return 'updated'
+    return None
+
+
+def _scene_path() -> str:
+    '''Returns the path of the open scene, or an empty string if it's untitled.'''
+    return cmds.file(q=True, sceneName=True)
+
+
+def _local_path(fileName: str) -> str:
+    '''
+    Returns the path to a file in the notes folder of the users maya preferences
+    for keeping data outside of the scene.
+    '''
+    path = join(cmds.internalVar(userPrefDir=True), 'notes', fileName)
+    os.makedirs(dirname(path), exist_ok=True)
+    return path
+
+
+def _option(name: str, choices: dict) -> str:
+    '''
+    Returns the choice saved in an optionVar, or the first choice if none was
+    saved or it no longer exists.
+    '''
+    if cmds.optionVar(exists=name):
+        value = cmds.optionVar(q=name)
+        if value in choices:
+            return value
+    return next(iter(choices))
+
+
+def _parse_date(value: str) -> datetime:
+    '''
+    Parses a date stored by a serialized note, returning None if there is none.
+    '''
+    if not value:
+        return None
+    return datetime.fromisoformat(value) # 2022-01-20 23:00:00.000000
+
+
+def _note_kwargs(noteMeta: dict) -> dict:
+    '''
+    Converts the decoded json of a serialized note into the keyword arguments
+    used to create a Note. Notes saved before ids were added get an id derived
+    from their creation date and author, and their checks one derived from the
+    note id, position and text, so they stay the same between loads.
+    '''
+    note_id = noteMeta.get('id')
+    if not note_id:
+        legacy_key = f"{noteMeta['created_date']}|{noteMeta['author']}"
+        note_id = uuid.uuid5(LEGACY_ID_NAMESPACE, legacy_key).hex
+
+    checklist = []
+    for index, checkJson in enumerate(noteMeta['checklist']):
+        check = json.loads(checkJson)
+        check_id = check.get('id')
+        if not check_id:
+            legacy_key = f"{note_id}|{index}|{check['text']}"
+            check_id = uuid.uuid5(LEGACY_ID_NAMESPACE, legacy_key).hex
+        checklist.append(NoteCheck(check['text'], check['checked'], id=check_id))
+
+    created_date = _parse_date(noteMeta['created_date'])
+    return dict(
+        id=note_id,
+        title=noteMeta['title'],
+        text=noteMeta['text'],
+        created_date=created_date,
+        modified_date=_parse_date(noteMeta.get('modified_date')) or created_date,
+        author=noteMeta['author'],
+        pinned=noteMeta['pinned'],
+        checklist=checklist
+    )
 
 
 def _maya_main_window():
@@ -184,6 +602,29 @@ def format_time(date: timedelta):
     return f'{seconds}s'
 
 
+# Sort keys for each way notes can be ordered. Every key ends with the note id
+# so no two notes share a key.
+NOTE_VIEWS = {
+    'Pinned first': lambda note: (not note.pinned, -note.created_date.timestamp(), note.id),
+    'Recently edited': lambda note: (-note.modified_date.timestamp(), note.id),
+    'Newest': lambda note: (-note.created_date.timestamp(), note.id),
+    'Oldest': lambda note: (note.created_date.timestamp(), note.id),
+}
+
+# Saved filters that can be picked to only show some of the notes.
+NOTE_FILTERS = {
+    'All notes': lambda note: True,
+    'My notes': lambda note: note.author == getpass.getuser(),
+    'Open checklist items': lambda note: any(
+        check.text and not check.checked for check in note.checklist),
+    'Pinned': lambda note: note.pinned,
+    'Older than a week': lambda note: datetime.utcnow() - note.created_date > timedelta(days=7),
+}
+
+# A filter is also added for every author of the loaded notes, named with this.
+AUTHOR_FILTER_PREFIX = 'By '
+
+
 @dataclass
 class NoteCheck:
     '''
@@ -197,6 +638,11 @@ class NoteCheck:
     text: str = ''
     checked: bool = False
     children: list = None
+    id: str = None
+
+    def __post_init__(self):
+        if self.id is None:
+            self.id = uuid.uuid4().hex
 
     def add_child(self, check):
         if self.children is None:
@@ -205,6 +651,7 @@ class NoteCheck:
 
     def serialize(self) -> str:
         json_data = {
+            'id': self.id,
             'checked': self.checked,
             'text': self.text
         }
@@ -228,16 +675,32 @@ class Note:
     checklist: list = None
     linked_objects: list = None
     pinned: bool = False
+    id: str = None
+    modified_date: datetime = None
+    source: str = None  # Path of the file a read-only note was read from.
     # date: InitVar[datetime] = None
 
     def __post_init__(self):
+        if self.id is None:
+            self.id = uuid.uuid4().hex
         if self.created_date is None:
             self.created_date = datetime.utcnow()
+        if self.modified_date is None:
+            self.modified_date = self.created_date
         if self.checklist is None:
             self.checklist = []
 
-        # Save this newly created note to the scene.
-        notes.append(self)
+        # Save this newly created note to the scene. Read-only notes from a
+        # referenced file or a preview are never saved here.
+        if self.source is None:
+            notes.append(self)
+
+    def is_readonly(self):
+        return self.source is not None
+
+    def touch(self):
+        '''Marks the note as modified now.'''
+        self.modified_date = datetime.utcnow()
 
     def add_check(self, check: NoteCheck):
         if self.checklist is None:
@@ -256,9 +719,11 @@ class Note:
 
     def serialize(self) -> str:
         json_data = {
+            'id': self.id,
             'title': self.title,
             'text': self.text,
             'created_date': str(self.created_date),
+            'modified_date': str(self.modified_date),
             'author': self.author,
             'pinned': self.pinned,
             'checklist': [],
@@ -273,6 +738,298 @@ class Note:
         return json.dumps(json_data)
 
 
+@dataclass
+class NoteEvent:
+    '''
+    A change to the notes sent to subscribers. kind is one of NOTE_ADDED,
+    NOTE_REMOVED, NOTE_EDITED, CHECK_TOGGLED, NOTES_RELOADED or NOTES_IMPORTED.
+    Edited notes list the names of the fields that changed.
+    '''
+    kind: str
+    note_id: str = None
+    fields: tuple = ()
+    check_id: str = None
+    checked: bool = None
+
+
+@dataclass
+class NotesPreview:
+    '''
+    The notes of a scene as they were when it was last saved, read from the local
+    preview cache so they can be shown while the scene is still opening.
+    '''
+    scene: str
+    data: str
+    notes: list
+
+
+class NoteOrder:
+    '''
+    Keeps track of the position of notes sorted by a key. When a note changes only
+    its own key is moved, found with a binary search, rather than sorting again.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+        self._keys = []
+        self._note_keys = {}    # note id -> the key it's currently sorted by
+
+    def __len__(self):
+        return len(self._keys)
+
+    def insert(self, note: Note) -> int:
+        '''Adds a note and returns its position.'''
+        key = self.key(note)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._note_keys[note.id] = key
+        return position
+
+    def remove(self, note: Note) -> int:
+        '''Removes a note and returns the position it was at.'''
+        key = self._note_keys.pop(note.id)
+        position = bisect_left(self._keys, key)
+        del self._keys[position]
+        return position
+
+    def update(self, note: Note) -> tuple:
+        '''Moves a note after it changed, returning its (old, new) position.'''
+        if self.key(note) == self._note_keys[note.id]:
+            position = bisect_left(self._keys, self._note_keys[note.id])
+            return position, position
+        return self.remove(note), self.insert(note)
+
+
+class NotesJournal:
+    '''
+    An append only journal of note edits kept outside of the scene so they can be
+    recovered if maya crashes before the scene is saved. Edits are buffered and
+    written out in batches with a single fsync so typing isn't slowed down.
+
+    Each line is an entry for one note of a scene holding the serialized note, or
+    null if the note was deleted. Every maya session writes to its own file in
+    the journal folder so sessions never rewrite each others entries, and all
+    the files are read when looking for edits to recover. Only the last entry of
+    a note matters so a sessions file is compacted once it grows too large.
+
+    Edits the user chose not to recover, and edits of a scene that was closed
+    without saving, are marked as discarded rather than removed, as they may be
+    in the file of another session.
+    '''
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._path = None
+        self._enabled = None
+        self._scene = None
+        self._baseline = {}     # note id -> modified date when last journaled
+        self._buffer = {}       # (scene, note id, discarded) -> latest entry to write
+        self._flush_pending = False
+        self._compact_size = JOURNAL_COMPACT_SIZE
+        self._callbacks = []
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = _local_path(join(self.folder, f'{os.getpid()}.jsonl'))
+        return self._path
+
+    def _is_enabled(self) -> bool:
+        # There is no one to recover edits for in batch mode.
+        if self._enabled is None:
+            self._enabled = not cmds.about(batch=True)
+        return self._enabled
+
+    def reset(self, scene: str, notes: list):
+        '''Treats the given notes of a scene as already being journaled.'''
+        self._scene = scene
+        self._baseline = {note.id: note.modified_date for note in notes}
+
+    def sync(self, scene: str, notes: list):
+        '''Journals the notes that were edited or deleted since the last sync.'''
+        if scene != self._scene:
+            self.reset(scene, [])
+        if not scene or not self._is_enabled():
+            return
+
+        seen = set()
+        for note in notes:
+            seen.add(note.id)
+            if self._baseline.get(note.id) != note.modified_date:
+                self._baseline[note.id] = note.modified_date
+                self._record(note.id, note.modified_date, note)
+
+        for note_id in self._baseline.keys() - seen:
+            del self._baseline[note_id]
+            self._record(note_id, datetime.utcnow(), None)
+
+    def discard(self, entries: list):
+        '''Marks journal entries so they are no longer offered for recovery.'''
+        for entry in entries:
+            marker = dict(entry, note=None, discarded=True)
+            self._buffer[(marker['scene'], marker['id'], True)] = marker
+        self.flush()
+
+    def discard_scene(self, scene: str):
+        '''Discards the edits this session journaled for a scene.'''
+        latest = {}
+        for entry in chain(self._read(self.path), self._buffered()):
+            if entry['scene'] == scene and not entry.get('discarded'):
+                latest[entry['id']] = entry
+        self.discard(list(latest.values()))
+
+    def _record(self, note_id: str, modified_date: datetime, note):
+        # Only the latest edit of a note is kept until the buffer is flushed, the
+        # note is serialized when it's written.
+        self._buffer[(self._scene, note_id, False)] = {
+            'scene': self._scene,
+            'id': note_id,
+            'modified_date': str(modified_date),
+            'note': note
+        }
+        self._watch_scenes()
+        if not self._flush_pending:
+            self._flush_pending = True
+            QtCore.QTimer.singleShot(JOURNAL_FLUSH_MS, self.flush)
+
+    def _buffered(self):
+        # Yields the buffered entries as they will be written.
+        for entry in self._buffer.values():
+            if isinstance(entry['note'], Note):
+                entry = dict(entry, note=entry['note'].serialize())
+            yield entry
+
+    def _watch_scenes(self):
+        # Edits of a scene that is left without saving were thrown away on
+        # purpose, so they should not be offered for recovery later.
+        if self._callbacks:
+            return
+        for message in (MSceneMessage.kBeforeNew,
+                        MSceneMessage.kBeforeOpen,
+                        MSceneMessage.kMayaExiting):
+            self._callbacks.append(MSceneMessage.addCallback(message, self._leaving_scene))
+
+    def _leaving_scene(self, *args):
+        scene = _scene_path()
+        if scene and cmds.file(q=True, modified=True):
+            self.discard_scene(scene)
+        else:
+            self.flush()
+
+    def flush(self):
+        '''Writes any buffered entries to this sessions journal file.'''
+        self._flush_pending = False
+        if not self._buffer:
+            return
+        lines = [json.dumps(entry) for entry in self._buffered()]
+        self._buffer = {}
+        try:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write('\n'.join(lines) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.getsize(self.path) > self._compact_size:
+                self.compact()
+        except OSError:
+            print(f'Failed to write notes journal {self.path}')
+
+    def _read(self, path: str):
+        # Yields every entry in a journal file, skipping any line left
+        # half written by a crash.
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            return
+
+    def _entries(self):
+        # Yields the entries of every sessions journal. Files that have not been
+        # written to in JOURNAL_MAX_DAYS are left over from old sessions and
+        # are deleted instead.
+        folder = dirname(self.path)
+        oldest = datetime.now() - timedelta(days=JOURNAL_MAX_DAYS)
+        for fileName in os.listdir(folder):
+            path = join(folder, fileName)
+            if not fileName.endswith('.jsonl'):
+                continue
+            try:
+                if datetime.fromtimestamp(os.path.getmtime(path)) < oldest:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            yield from self._read(path)
+
+    def compact(self):
+        '''
+        Rewrites this sessions journal file keeping only the last entry of each
+        note, and the last discard marker of each note. The next compaction waits
+        until the file has grown to twice the compacted size, so a journal of
+        many notes isn't rewritten on every flush.
+        '''
+        latest = {}
+        for entry in chain(self._read(self.path), list(self._buffered())):
+            key = (entry['scene'], entry['id'], entry.get('discarded', False))
+            if key not in latest or _journal_date(entry) >= _journal_date(latest[key]):
+                latest[key] = entry
+        self._buffer = {}
+
+        temp = self.path + '.tmp'
+        try:
+            with open(temp, 'w', encoding='utf-8') as file:
+                for entry in latest.values():
+                    file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp, self.path)
+            self._compact_size = max(JOURNAL_COMPACT_SIZE, 2 * os.path.getsize(self.path))
+        except OSError:
+            print(f'Failed to compact notes journal {self.path}')
+
+    def pending(self, scene: str, notes: list) -> list:
+        '''
+        Returns the last journal entry of every note in the scene that is newer
+        than the given notes, these are edits that never made it into the scene.
+        '''
+        if not scene:
+            return []
+        latest = {}
+        discarded = {}
+        for entry in self._entries():
+            if entry['scene'] != scene:
+                continue
+            found = discarded if entry.get('discarded') else latest
+            before = found.get(entry['id'])
+            if before is None or _journal_date(entry) >= _journal_date(before):
+                found[entry['id']] = entry
+
+        dates = {note.id: note.modified_date for note in notes}
+        pending = []
+        for entry in latest.values():
+            marker = discarded.get(entry['id'])
+            if marker is not None and _journal_date(marker) >= _journal_date(entry):
+                continue
+            date = dates.get(entry['id'])
+            if date is None:
+                if entry['note'] is not None:
+                    pending.append(entry)
+            elif _journal_date(entry) > date:
+                pending.append(entry)
+        return pending
+
+
+def _journal_date(entry: dict) -> datetime:
+    return _parse_date(entry['modified_date'])
+
+
+journal = NotesJournal(JOURNAL_DIR)
+atexit.register(journal.flush)
+
+
 class WrappedTextWidget(QPlainTextEdit):
     '''
     Wrapper for QPlainTextEdit to create a version of the widget that verticly fits to
@@ -408,12 +1165,27 @@ class NoteCheckWidget(QWidget):
         self._layout.addWidget(self.checkbox)
         self._layout.addWidget(self.text)
 
+    def bind(self, noteCheck: NoteCheck):
+        '''
+        Points this widget at a different check so it can be reused instead of
+        creating a new widget. Signals are blocked so rebinding dosn't save.
+        '''
+        self.note_check = noteCheck
+        self.checkbox.blockSignals(True)
+        self.text.blockSignals(True)
+        self.checkbox.setChecked(noteCheck.checked)
+        self.text.setPlainText(noteCheck.text)
+        self.checkbox.blockSignals(False)
+        self.text.blockSignals(False)
+
     def _update_text(self):
         self.note_check.text = self.text.toPlainText()
+        self.note.touch()
         save_notes()
 
     def _update_checked_status(self):
         self.note_check.checked = self.checkbox.isChecked()
+        self.note.touch()
         save_notes()
 
     def get_text(self) -> str:
@@ -425,17 +1197,19 @@ class NoteCheckWidget(QWidget):
 
 class NoteChecklistWidget(QWidget):
     '''
+    Displays the checklist of a note. Only a page of rows is created at a time and
+    rows are pooled, so when checks are removed or the list is collapsed their
+    widgets get rebound to other checks rather than being deleted and rebuilt.
+    Long checklists start collapsed to a "N of M done" summary.
 
-    TODO handle the updating of the notes list within here.
-        - Connect typing to check text input. If this is the last check append a
-        new empty disabled check to add a new item to, this should not be saved as a
-        new item until text is added to it. Otherwise if it's not the
-        last element just update the notes data.
+    The first page of checks is shown above the "Show more" button and the checks
+    added since, including the empty one used to add items, always show below it.
 
     TODO handle when the text of a note is empty, and focus is lost from the check,
         remove it from the checklist.
     '''
     emptied = QtCore.Signal()
+    changed = QtCore.Signal()
 
     def __init__(self, note: Note):
         '''
@@ -451,73 +1225,203 @@ class NoteChecklistWidget(QWidget):
         self.setLayout(self._layout)
         self._layout.setSpacing(0)
 
-        self.items = []
+        self.items = {}     # Rows currently shown, keyed by their check id.
+        self._pool = []     # Hidden rows ready to be rebound to another check.
+        self._limit = CHECKLIST_PAGE_SIZE   # Checks shown at the start.
+        self._tail = 0                      # Checks always shown at the end.
+        self._collapsed = len(note.checklist or []) > CHECKLIST_COLLAPSE_SIZE
 
+        self._construct()
         self._load_items()
 
+    def _construct(self):
+        self._summary_btn = QToolButton(
+            toolButtonStyle=QtCore.Qt.ToolButtonTextBesideIcon)
+        self._rows_layout = QVBoxLayout()
+        self._rows_layout.setSpacing(0)
+        self._rows_layout.setContentsMargins(0, 0, 0, 0)
+        self._rows_widget = QWidget(layout=self._rows_layout)
+        self._more_btn = QToolButton()
+        self._tail_layout = QVBoxLayout()
+        self._tail_layout.setSpacing(0)
+        self._tail_layout.setContentsMargins(0, 0, 0, 0)
+        self._tail_widget = QWidget(layout=self._tail_layout)
+
+        self._summary_btn.setProperty('tag', 'summary')
+        self._more_btn.setProperty('tag', 'more')
+
+        self._layout.addWidget(self._summary_btn)
+        self._layout.addWidget(self._rows_widget)
+        self._layout.addWidget(self._more_btn)
+        self._layout.addWidget(self._tail_widget)
+
+        self._summary_btn.clicked.connect(self.toggle_collapsed)
+        self._more_btn.clicked.connect(self.show_more)
+
     def is_empty(self):
         # Return if the checklist is empty
-        return len(self.items) == 0
+        return len(self.note.checklist) == 0
 
-    def _empty_item(self):
-        # Return a new empty note check.
+    def _load_items(self):
+        # Adds the empty check used to add new items then shows the first page.
+        if not self.note.is_readonly():
+            self.note.add_check(NoteCheck())
+            self._tail = 1
+        self._render()
+
+    def _render(self):
+        # Rebinds the rows to the checks that are currently in view.
+        for row in list(self.items.values()):
+            self._release(row)
+        if not self._collapsed:
+            checklist = self.note.checklist
+            for check in checklist[:self._limit]:
+                self._show(check)
+            for check in checklist[max(self._limit, len(checklist) - self._tail):]:
+                self._show(check, tail=True)
+        self._update_summary()
+
+    def _new_row(self, check: NoteCheck) -> NoteCheckWidget:
+        # Signals are connected once per row, the row is reused after that.
+        row = NoteCheckWidget(check, self.note)
+        row.text.focusOut.connect(lambda: self._lose_focus(row))
+        row.text.textChanged.connect(lambda: self._update_text(row))
+        row.checkbox.stateChanged.connect(self._toggled)
+        if self.note.is_readonly():
+            row.checkbox.setEnabled(False)
+            row.text.setReadOnly(True)
+        return row
+
+    def _show(self, check: NoteCheck, tail: bool = False) -> NoteCheckWidget:
+        # Takes a row from the pool, or makes one, and shows the check with it.
+        if self._pool:
+            row = self._pool.pop()
+            row.bind(check)
+        else:
+            row = self._new_row(check)
+        self.items[check.id] = row
+        if tail:
+            self._tail_layout.addWidget(row)
+        else:
+            self._rows_layout.addWidget(row)
+        row.setVisible(True)
+        return row
+
+    def _release(self, row: NoteCheckWidget):
+        # Forget the row before hiding it so the focus lost is ignored.
+        del self.items[row.note_check.id]
+        self._rows_layout.removeWidget(row)
+        self._tail_layout.removeWidget(row)
+        row.setVisible(False)
+        self._pool.append(row)
+
+    def _append_empty(self):
+        # Add a new empty note check to add items with.
         check = NoteCheck()
         self.note.add_check(check)
-        return NoteCheckWidget(check, self.note)
-
-    def _load_items(self):
-        # Loads all the checklist items from the note object in as a widget.
-        if self.note.checklist is not None:
-            for check in self.note.checklist:
-                self.append(NoteCheckWidget(check, self.note))
-        # if not self.items[-1].note_check.text == '':
-        self.append(self._empty_item())
-
-    def append(self, check: NoteCheckWidget):
-        '''Append a new note check to the checklist'''
-        self.items.append(check)
-        self._layout.addWidget(check)
-
-        # Connect signals
-        check.text.focusOut.connect(lambda: self._lose_focus(check))
-        check.text.textChanged.connect(lambda: self._update_text(check))
+        self._tail += 1
+        if not self._collapsed:
+            self._show(check, tail=True)
+        self._update_summary()
+
+    def _remove_check(self, check: NoteCheck):
+        row = self.items.get(check.id)
+        if row is not None:
+            self._release(row)
+        checklist = self.note.checklist
+        index = next(i for i, other in enumerate(checklist) if other is check)
+        in_tail = index >= len(checklist) - self._tail
+        del checklist[index]
+
+        if in_tail:
+            self._tail -= 1
+        elif not self._collapsed and len(checklist) - self._tail >= self._limit:
+            # Pull the next hidden check into view to keep the page full.
+            check = checklist[self._limit - 1]
+            if check.id not in self.items:
+                self._show(check)
+        self._update_summary()
 
     def pop(self, index: int):
-        widget = self.items.pop(index)
-        self._layout.removeWidget(widget)
-        self.note.checklist.remove(widget.note_check)
-        widget.deleteLater()
+        self._remove_check(self.note.checklist[index])
 
     def remove(self, check: NoteCheckWidget):
-        self.items.remove(check)
-        self._layout.removeWidget(check)
-        self.note.checklist.remove(check.note_check)
-        check.deleteLater()
+        self._remove_check(check.note_check)
+
+    def make_editable(self):
+        '''Lets the checks be edited after the note stopped being read-only.'''
+        for row in chain(self.items.values(), self._pool):
+            row.checkbox.setEnabled(True)
+            row.text.setReadOnly(False)
+        self._append_empty()
+
+    def show_more(self):
+        '''Show the next page of checks.'''
+        start = self._limit
+        self._limit += CHECKLIST_PAGE_SIZE
+        end = min(self._limit, len(self.note.checklist) - self._tail)
+        for check in self.note.checklist[start:end]:
+            self._show(check)
+        self._update_summary()
+
+    def toggle_collapsed(self):
+        '''Switch between showing the checks and only the done summary.'''
+        self._collapsed = not self._collapsed
+        self._render()
+
+    def _toggled(self):
+        self._update_summary()
+        self.changed.emit()
+
+    def _update_summary(self):
+        checks = [check for check in self.note.checklist if check.text]
+        summarize = self._collapsed or len(checks) > CHECKLIST_PAGE_SIZE
+        self._summary_btn.setVisible(summarize)
+        if summarize:
+            done = sum(1 for check in checks if check.checked)
+            self._summary_btn.setText(f'{done} of {len(checks)} done')
+            self._summary_btn.setArrowType(
+                QtCore.Qt.RightArrow if self._collapsed else QtCore.Qt.DownArrow)
+
+        hidden = len(self.note.checklist) - self._limit - self._tail
+        self._rows_widget.setVisible(not self._collapsed)
+        self._tail_widget.setVisible(not self._collapsed)
+        self._more_btn.setVisible(not self._collapsed and hidden > 0)
+        self._more_btn.setText(f'Show {min(hidden, CHECKLIST_PAGE_SIZE)} more')
 
     def _update_text(self, check: NoteCheckWidget):
-        index = self.items.index(check)
-        size = len(self.items) - 1
-        if index == size:
+        if check.note_check.id not in self.items:
+            return
+        self.changed.emit()
+        self._update_summary()
+        checklist = self.note.checklist
+        if check.note_check is checklist[-1]:
             if len(check.get_text()) > 0:
-                self.append(self._empty_item())
+                self._append_empty()
 
-        elif index < size and len(self.items[index + 1].get_text()) == 0 and len(check.get_text()) == 0:
+        elif len(checklist) > 1 and check.note_check is checklist[-2] \
+                and len(checklist[-1].text) == 0 and len(check.get_text()) == 0:
             self.pop(-1)
 
     def _lose_focus(self, check: NoteCheckWidget):
+        if check.note_check.id not in self.items:
+            return
         text = check.text.toPlainText()
-        index = self.items.index(check)
-        if len(text) == 0 and not (index == len(self.items) - 1 and len(self.items) > 1):
+        checklist = self.note.checklist
+        is_last = check.note_check is checklist[-1]
+        if len(text) == 0 and not (is_last and len(checklist) > 1):
             self.remove(check)
         if self.is_empty():
             self.emptied.emit()
-            self.append(self._empty_item())
+            self._append_empty()
 
 
 class NoteWidget(QWidget):
     '''
     A widget to represent a Note object.
     '''
+    changed = QtCore.Signal(object)
+    deleted = QtCore.Signal(object)
 
     def __init__(self, note: Note):
         super(NoteWidget, self).__init__()
@@ -557,9 +1461,9 @@ class NoteWidget(QWidget):
         self._archive_btn = IconButton(icon('archive.svg'), icon(
             'archive-hover.svg'), icon('archive-active.svg'), tip='Archive this note')
         self._pin_btn = IconButton(icon('pin.svg'), icon(
-            'pin-hover.svg'), icon('pin-active.svg'), tip='Delete this note')
+            'pin-hover.svg'), icon('pin-active.svg'), tip='Pin this note to the top')
         self._delete_btn = IconButton(icon('delete.svg'), icon(
-            'delete-hover.svg'), icon('delete-active.svg'), tip='Pin this note to the top')
+            'delete-hover.svg'), icon('delete-active.svg'), tip='Delete this note')
         self._listadd_btn = IconButton(icon('listadd.svg'), icon(
             'listadd-hover.svg'), icon('listadd-active.svg'), tip='Create a checklist')
         self._linked_icon = QToolButton(
@@ -594,13 +1498,20 @@ class NoteWidget(QWidget):
         self.text.setProperty('tag', 'text')
         self.info.setProperty('tag', 'info')
 
+        # Notes from referenced files can only be looked at.
+        if self.note.is_readonly():
+            self.title.setReadOnly(True)
+            self.text.setReadOnly(True)
+            self._tools_widget.setVisible(False)
+
     def _connect_signals(self):
         self._delete_btn.clicked.connect(self.delete)
         self._listadd_btn.clicked.connect(self.add_checklist)
-        self._pin_btn.clicked.connect(self.pin)
+        self._pin_btn.clicked.connect(self.toggle_pin)
 
         # Checklist connections
         self.checklist.emptied.connect(self.remove_checklist)
+        self.checklist.changed.connect(lambda: self.changed.emit(self.note))
 
         # Text update connections
         self.title.textChanged.connect(self._update_title)
@@ -608,22 +1519,44 @@ class NoteWidget(QWidget):
 
     def _update_title(self):
         self.note.title = self.title.toPlainText()
+        self.note.touch()
         save_notes()
+        self.changed.emit(self.note)
 
     def _update_text(self):
         self.note.text = self.text.toPlainText()
+        self.note.touch()
         save_notes()
+        self.changed.emit(self.note)
 
     def pin(self):
         self.note.pinned = True
+        self.note.touch()
         save_notes()
+        self.changed.emit(self.note)
 
     def unpin(self):
         self.note.pinned = False
+        self.note.touch()
         save_notes()
+        self.changed.emit(self.note)
+
+    def make_editable(self):
+        '''Lets a note that was shown read-only be edited.'''
+        self.title.setReadOnly(False)
+        self.text.setReadOnly(False)
+        self._tools_widget.setVisible(True)
+        self.checklist.make_editable()
+
+    def toggle_pin(self):
+        if self.note.pinned:
+            self.unpin()
+        else:
+            self.pin()
 
     def delete(self):
         notes.remove(self.note)
+        self.deleted.emit(self.note)
         self.setParent(None)
         self.deleteLater()
         save_notes()
@@ -660,8 +1593,21 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         # make sure all the notes are loaded.
         load_notes()
 
-        # an array of all the notes currently loaded in the UI
-        self._note_widgets = []
+        # the widgets of all the notes currently loaded in the UI, by note id,
+        # and the order they are shown in.
+        self._note_widgets = {}
+        self._reference_groups = {}     # Referenced file path -> (notes, widgets)
+        self._references_pending = False
+        self._opening = False
+        self._preview = None
+        self._view = _option(VIEW_OPTION, NOTE_VIEWS)
+        # The saved filter may be an author filter, it's checked once the
+        # filter picker is filled in.
+        self._filter = next(iter(NOTE_FILTERS))
+        if cmds.optionVar(exists=FILTER_OPTION):
+            self._filter = cmds.optionVar(q=FILTER_OPTION)
+        self._author_filters = {}   # filter name -> author
+        self._order = NoteOrder(NOTE_VIEWS[self._view])
         self.callbacks = []
 
         # All pet rocks need to have a name.
@@ -684,6 +1630,7 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         self._connect_signals()
         self.refresh_ui()
         self._create_callbacks()
+        subscribe(self._notes_changed)
 
     def _construct_ui(self):
         '''Construct all the elements needed to display the content.'''
@@ -700,9 +1647,28 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         search_layout.addStretch()
         self._layout.addWidget(self.search_widget)
 
+        # Create the view and filter pickers
+        view_layout = QHBoxLayout()
+        self.view_input = QComboBox()
+        self.view_input.addItems(list(NOTE_VIEWS))
+        self.view_input.setCurrentText(self._view)
+        self.filter_input = QComboBox()
+        self._update_filters()
+
+        view_layout.addStretch()
+        view_layout.addWidget(self.view_input)
+        view_layout.addWidget(self.filter_input)
+        view_layout.addStretch()
+        self._layout.addWidget(QWidget(objectName='views', layout=view_layout))
+
         # Add the notes widget as in a scroll area.
+        # Notes from referenced files are grouped below the scenes own notes.
         self._notes_layout = QVBoxLayout()
-        self._notes_widget = QWidget(layout=self._notes_layout)
+        self._references_layout = QVBoxLayout()
+        notes_layout = QVBoxLayout()
+        notes_layout.addLayout(self._notes_layout)
+        notes_layout.addLayout(self._references_layout)
+        self._notes_widget = QWidget(layout=notes_layout)
         self._notes_widget.setSizePolicy(
             QSizePolicy.Expanding, QSizePolicy.Maximum)
         self._layout.addWidget(QScrollArea(
@@ -725,6 +1691,8 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         '''Connects all signals for the base ui'''
         self.create_btn.clicked.connect(self.create_new_note)
         self.search_input.textChanged.connect(self._update_search)
+        self.view_input.currentTextChanged.connect(self.set_view)
+        self.filter_input.currentTextChanged.connect(self.set_filter)
 
     def _create_callbacks(self):
         '''
@@ -735,16 +1703,71 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
             MSceneMessage.kAfterNew,
             self._reload_all
         ))
+        self.callbacks.append(MSceneMessage.addCallback(
+            MSceneMessage.kBeforeOpen,
+            self._show_preview
+        ))
         self.callbacks.append(MSceneMessage.addCallback(
             MSceneMessage.kAfterOpen,
             self._reload_all
         ))
+        self.callbacks.append(MSceneMessage.addCallback(
+            MSceneMessage.kAfterSave,
+            self._scene_saved
+        ))
+        for message in (MSceneMessage.kAfterCreateReference,
+                        MSceneMessage.kAfterRemoveReference,
+                        MSceneMessage.kAfterLoadReference,
+                        MSceneMessage.kAfterUnloadReference):
+            self.callbacks.append(MSceneMessage.addCallback(
+                message,
+                self._refresh_references
+            ))
+
+    def _show_preview(self, *args):
+        '''
+        Shows the last saved notes of the scene being opened as read-only, so
+        there is something to look at while a heavy scene loads.
+        '''
+        # References load one by one while opening, they are all shown at once
+        # after the scene is open.
+        self._opening = True
+        self._preview = load_preview(MFileIO.beforeOpenFilename())
+        if self._preview is None:
+            return
+        self.refresh_ui(self._preview.notes)
+
+        # Paint now without going back to the event loop, maya is busy opening.
+        self.layout().activate()
+        self.repaint()
 
     def _reload_all(self, *args):
         '''Reloads all notes'''
-        load_notes()
+        self._opening = False
+        preview, self._preview = self._preview, None
+
+        # Keep what the file holds before any recovered edits are saved over it.
+        data = None
+        if cmds.objExists(META_NODE):
+            data = cmds.getAttr(f'{META_NODE}.data')
+        if preview is None or preview.data != data:
+            save_preview(data=data)
+
+        if load_notes(preview=preview):
+            # The scene has the notes already shown, so just unlock them.
+            for widget in self._note_widgets.values():
+                widget.make_editable()
+            self._update_references()
+            return
         self.refresh_ui()
 
+    def _scene_saved(self, *args):
+        '''
+        Updates the preview to match the saved file. The journal is left alone,
+        entries that are not newer than the saved notes are never offered again.
+        '''
+        save_preview(_scene_path())
+
     def hideEvent(self, event):
         '''
         Called when the window is closed. Maya just hides and dosn't actually call
@@ -754,6 +1777,12 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         # Unregister all callbacks when window is closed.
         for callback in self.callbacks:
             MSceneMessage.removeCallback(callback)
+        unsubscribe(self._notes_changed)
+
+    def _notes_changed(self, events: list):
+        '''Rebuilds the notes after an import replaced some of them.'''
+        if any(event.kind == NOTES_IMPORTED for event in events):
+            self.refresh_ui()
 
 
     def resizeEvent(self, event):
@@ -764,34 +1793,167 @@ class NotesUI(MayaQWidgetDockableMixin, QDialog):
         )
 
     def create_new_note(self):
-        note = Note()
+        note = Note(author=getpass.getuser())
+        if note.author not in self._author_filters.values():
+            self._update_filters()
         widget = NoteWidget(note)
-        self._add_note(widget)
+        self._add_note(widget, show=True)
 
-    def refresh_ui(self):
-        for widget in self._note_widgets:
+    def refresh_ui(self, preview: list = None):
+        '''
+        Rebuilds the widgets of all notes. If preview notes are given they are
+        shown on their own while the scene they belong to is opening.
+        '''
+        for widget in self._note_widgets.values():
             if widget is None: continue
             widget.setParent(None)
             widget.deleteLater()
         self._note_widgets.clear()
-        for note in notes:
+        self._order = NoteOrder(NOTE_VIEWS[self._view])
+        if preview is None:
+            self._update_filters()
+
+        # Adding the notes already sorted puts each one at the end.
+        for note in sorted(notes if preview is None else preview, key=self._order.key):
             self._add_note(NoteWidget(note))
 
+        self._clear_references()
+        if preview is None:
+            self._update_references()
+
+    def _clear_references(self):
+        for path in list(self._reference_groups):
+            self._remove_reference_group(path)
+
+    def _remove_reference_group(self, path: str):
+        for widget in self._reference_groups.pop(path)[1]:
+            widget.setParent(None)
+            widget.deleteLater()
+
+    def _refresh_references(self, *args):
+        '''
+        Called when references change. Many references can change at once so the
+        groups are updated once control gets back to the event loop.
+        '''
+        if self._opening or self._references_pending:
+            return
+        self._references_pending = True
+        QtCore.QTimer.singleShot(0, self._update_references)
+
+    def _update_references(self):
+        '''
+        Updates the read-only groups of notes from referenced files, only
+        rebuilding the groups of references whose notes changed.
+        '''
+        self._references_pending = False
+        referenced = load_referenced_notes()
+
+        for path, (reference_notes, widgets) in list(self._reference_groups.items()):
+            if referenced.get(path) is not reference_notes:
+                self._remove_reference_group(path)
+
+        for path, reference_notes in referenced.items():
+            if path in self._reference_groups:
+                continue
+            widgets = []
+            if reference_notes:
+                header = QLabel(os.path.basename(path), toolTip=path)
+                header.setProperty('tag', 'reference')
+                self._references_layout.addWidget(header)
+                widgets.append(header)
+
+            for note in sorted(reference_notes, key=self._order.key):
+                widget = NoteWidget(note)
+                widget.setVisible(self._matches(note))
+                self._references_layout.addWidget(widget)
+                widgets.append(widget)
+            self._reference_groups[path] = (reference_notes, widgets)
+
+    def set_view(self, view: str):
+        '''Orders the notes by one of the NOTE_VIEWS.'''
+        self._view = view
+        cmds.optionVar(sv=(VIEW_OPTION, view))
+
+        self._order = NoteOrder(NOTE_VIEWS[view])
+        widgets = self._note_widgets.values()
+        for widget in sorted(widgets, key=lambda widget: self._order.key(widget.note)):
+            self._notes_layout.removeWidget(widget)
+            self._notes_layout.insertWidget(self._order.insert(widget.note), widget)
+        self._clear_references()
+        self._update_references()
+
+    def _update_filters(self):
+        '''
+        Fills the filter picker with the NOTE_FILTERS and a filter for every
+        author of the loaded notes.
+        '''
+        authors = sorted({note.author for note in notes})
+        self._author_filters = {
+            f'{AUTHOR_FILTER_PREFIX}{author or "unknown"}': author for author in authors}
+        choices = list(NOTE_FILTERS) + list(self._author_filters)
+        if self._filter not in choices:
+            self._filter = next(iter(NOTE_FILTERS))
+
+        self.filter_input.blockSignals(True)
+        self.filter_input.clear()
+        self.filter_input.addItems(choices)
+        self.filter_input.setCurrentText(self._filter)
+        self.filter_input.blockSignals(False)
+
+    def set_filter(self, name: str):
+        '''Only shows the notes matching one of the NOTE_FILTERS or an author.'''
+        self._filter = name
+        cmds.optionVar(sv=(FILTER_OPTION, name))
+        self._update_search()
+
+    def _matches(self, note: Note) -> bool:
+        # Return if a note passes both the filter and the search.
+        if self._filter in self._author_filters:
+            if note.author != self._author_filters[self._filter]:
+                return False
+        elif not NOTE_FILTERS[self._filter](note):
+            return False
+        search = self.search_input.text().lower()
+        return search in note.text.lower() or search in note.title.lower()
+
     def _update_search(self):
         '''
         Update the current search input. This will hide any notes that
         don't match the current search.
         '''
-        search = self.search_input.text().lower()
-        for note_widget in self._note_widgets:
-            note = note_widget.note
-            in_text = search in note.text.lower()
-            in_title = search in note.title.lower()
-            note_widget.setVisible(in_text or in_title)
-
-    def _add_note(self, widget: NoteWidget):
-        self._note_widgets.append(widget)
-        self._notes_layout.addWidget(widget)
+        for note_widget in self._note_widgets.values():
+            note_widget.setVisible(self._matches(note_widget.note))
+        for reference_notes, widgets in self._reference_groups.values():
+            for widget in widgets:
+                if isinstance(widget, NoteWidget):
+                    widget.setVisible(self._matches(widget.note))
+
+    def _add_note(self, widget: NoteWidget, show: bool = False):
+        '''
+        Adds the widget of a note in order. It's hidden if it dosn't match the
+        search or filter, unless show is set for a note that was just created.
+        '''
+        note = widget.note
+        self._note_widgets[note.id] = widget
+        self._notes_layout.insertWidget(self._order.insert(note), widget)
+        widget.setVisible(show or self._matches(note))
+
+        widget.changed.connect(self._note_changed)
+        widget.deleted.connect(self._note_deleted)
+
+    def _note_changed(self, note: Note):
+        # Move just this note to where it now belongs. It stays visible even if it
+        # no longer matches so it dosn't vanish while being edited, the filter
+        # is only applied again when the search or filter changes.
+        widget = self._note_widgets[note.id]
+        old, new = self._order.update(note)
+        if old != new:
+            self._notes_layout.removeWidget(widget)
+            self._notes_layout.insertWidget(new, widget)
+
+    def _note_deleted(self, note: Note):
+        self._order.remove(note)
+        del self._note_widgets[note.id]
 
 
 def run_main(**kwargs):